@@ -1,5 +1,6 @@
 """Authentication utilities for protecting API endpoints."""
-from typing import Optional, Set, Tuple
+from dataclasses import dataclass
+from typing import FrozenSet, Optional, Tuple
 from fastapi import Header, HTTPException, status
 import os
 
@@ -11,47 +12,90 @@ from security import KeyManager, mask_secret
 KeyRecord = Tuple[str, bool]  # (value, is_hashed)
 
 
-def _parse_key_records() -> Set[KeyRecord]:
+def _parse_key_records() -> FrozenSet[KeyRecord]:
     """Load API keys from env, supporting plain or hashed values.
 
     Prefix hashed keys with ``hash:`` and provide the HMAC/SHA-256 digest.
     """
     keys_raw = os.getenv("API_KEYS", "")
-    records: Set[KeyRecord] = set()
+    records = []
     for raw_key in keys_raw.split(","):
         key = raw_key.strip()
         if not key:
             continue
         if key.startswith("hash:"):
-            records.add((key.split("hash:", 1)[1], True))
+            records.append((key.split("hash:", 1)[1], True))
         else:
-            records.add((key, False))
-    return records
+            records.append((key, False))
+    return frozenset(records)
+
+
+def _decode_hashed_keys(values: Tuple[str, ...]) -> Tuple[bytes, ...]:
+    """Decode hex digests once so requests compare raw bytes."""
+    digests = []
+    for value in values:
+        try:
+            digests.append(bytes.fromhex(value))
+        except ValueError:
+            logger.warning("Ignoring hashed API key that is not valid hex: {}", mask_secret(value))
+    return tuple(digests)
+
+
+@dataclass(frozen=True, slots=True)
+class _AuthEnv:
+    """Parsed API key configuration, replaced as a whole on reload."""
+
+    configured: bool
+    digests: FrozenSet[bytes]
+
+
+def _load_auth_env() -> _AuthEnv:
+    """Parse ``API_KEYS`` once into an index of key digests.
+
+    Plain keys are digested with the same (optionally peppered) hash as the
+    ``hash:`` entries, so every key is checked by a single set lookup.
+    """
+    records = _parse_key_records()
+    plain = (KEY_MANAGER.compute_digest(value) for value, is_hashed in records if not is_hashed)
+    hashed = _decode_hashed_keys(tuple(sorted(value for value, is_hashed in records if is_hashed)))
+    return _AuthEnv(configured=bool(records), digests=frozenset((*plain, *hashed)))
 
 
 KEY_MANAGER = KeyManager()
-KEY_RECORDS: Set[KeyRecord] = _parse_key_records()
+_ENV: _AuthEnv = _load_auth_env()
+
+
+def reload_keys() -> None:
+    """Re-read ``API_KEYS`` from the environment, e.g. after key rotation.
+
+    The new configuration is swapped in with a single assignment, so
+    in-flight requests see either the old or the new key set, never a mix.
+    """
+    global _ENV
+    _ENV = _load_auth_env()
+    logger.info("API keys reloaded.")
 
 
 def api_keys_configured() -> bool:
     """Check whether API keys have been configured."""
-    return bool(KEY_RECORDS)
+    return _ENV.configured
 
 
 def _is_valid_api_key(provided: str) -> bool:
-    plain_keys = {value for value, is_hashed in KEY_RECORDS if not is_hashed}
-    if provided in plain_keys:
-        return True
+    """Check a key with one digest and one lookup in the key index.
 
-    hashed_keys = [value for value, is_hashed in KEY_RECORDS if is_hashed]
-    for stored_hash in hashed_keys:
-        if KEY_MANAGER.verify_hash(provided, stored_hash):
-            return True
-    return False
+    Only the digest of the provided key is compared, never the key itself,
+    so lookup timing reveals nothing about how much of a key matched.
+    """
+    return KEY_MANAGER.compute_digest(provided) in _ENV.digests
 
 
 async def verify_api_key(x_api_key: Optional[str] = Header(None)) -> None:
-    """FastAPI dependency to enforce API key authentication."""
+    """FastAPI dependency to enforce API key authentication.
+
+    Kept ``async`` on purpose: FastAPI awaits coroutine dependencies inline,
+    but dispatches plain ``def`` dependencies to the threadpool.
+    """
     if not api_keys_configured():
         logger.debug("API key authentication disabled (no keys configured).")
         return
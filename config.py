@@ -2,13 +2,26 @@
 Configuration module for loading environment variables.
 """
 import os
+from dataclasses import dataclass
 from typing import Optional
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+_LOADED: bool = False
 
 
+def _load_once() -> None:
+    """Load environment variables from .env file, only on first import."""
+    global _LOADED
+    if _LOADED:
+        return
+    load_dotenv()
+    _LOADED = True
+
+
+_load_once()
+
+
+@dataclass(frozen=True, slots=True)
 class Config:
     """Application configuration loaded from environment variables."""
 
@@ -32,6 +45,9 @@ class Config:
     DEFAULT_QUOTE_BALANCE: float = float(os.getenv("DEFAULT_QUOTE_BALANCE", "50000"))
     DEFAULT_ORDER_QUANTITY: float = float(os.getenv("DEFAULT_ORDER_QUANTITY", "0.01"))
 
+    # Logging
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+
     # Security settings
     API_KEY_HEADER_NAME: str = os.getenv("API_KEY_HEADER_NAME", "X-API-Key")
     KEY_HASH_PEPPER: str = os.getenv("KEY_HASH_PEPPER", "")
@@ -7,13 +7,18 @@ managed database (PostgreSQL, MySQL, etc.).
 """
 from __future__ import annotations
 
+import asyncio
 import json
 import os
+import queue
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 from loguru import logger
 
@@ -21,91 +26,378 @@ from loguru import logger
 # This is the only writable directory in many serverless functions
 DB_PATH = Path("/tmp/trades.db") if os.environ.get("VERCEL") or os.environ.get("LAMBDA_TASK_ROOT") else Path("trades.db")
 
-_DB_INITIALIZED: bool = False
+# Timestamps are stored as INTEGER nanoseconds since the Unix epoch and only
+# formatted as ISO-8601 when rows are read back.
+_EPOCH = datetime(1970, 1, 1)
+
+# Balances are stored as INTEGER minor units (1e-8 of an asset) so debits,
+# credits and the funds check are exact; the public API still speaks floats.
+_BALANCE_SCALE = 10**8
+
+
+def _to_units(amount: float) -> int:
+    return round(amount * _BALANCE_SCALE)
+
+
+def _from_units(units: int) -> float:
+    return units / _BALANCE_SCALE
+
+# Process-wide connection reused across requests; SQLite serializes writers anyway,
+# so a single lock around write transactions is enough.
+_CONN: Optional[sqlite3.Connection] = None
+_CONN_LOCK = threading.Lock()
+_WRITE_LOCK = threading.RLock()
+
+# Schema setup runs once per process; concurrent first callers wait for it
+_INITIALIZED = False
+_INIT_LOCK = threading.Lock()
+
+# Reads go through a small pool of extra connections so they can run in
+# parallel (WAL allows concurrent readers alongside the writer).
+_READ_POOL_SIZE = 10
+_READ_POOL: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+_READ_POOL_OPENED = 0
+
+# Applied to every new connection. WAL + synchronous=NORMAL stays crash-safe while
+# skipping the per-commit fsync; mmap lets reads bypass read() syscalls.
+_CONNECTION_PRAGMAS: Tuple[str, ...] = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "cache_size=-20000",
+    "mmap_size=134217728",
+    "temp_store=MEMORY",
+    "foreign_keys=ON",
+    "wal_autocheckpoint=1000",
+)
+
+# Hot-path SQL kept as module constants so the connection's statement cache
+# always sees the identical string and skips re-preparing it.
+SQL_INSERT_TRADE = """
+    INSERT INTO trades (
+        transaction_id, sequence_number, request_hash, timestamp,
+        pair, action, rsi, price, quantity, status, metadata
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# Single-trade insert that doubles as the dedupe check: a replayed request_hash
+# returns no row instead of raising.
+SQL_INSERT_TRADE_ONCE = SQL_INSERT_TRADE.rstrip() + """
+    ON CONFLICT(request_hash) DO NOTHING
+    RETURNING id, sequence_number
+"""
+# Sequence numbers are claimed inside the trade transaction: advance the
+# tracker row if the requested number (or any, when NULL) is next, and only
+# fall back to creating the row for a pair/action's first trade.
+SQL_ADVANCE_SEQUENCE = """
+    UPDATE sequence_tracker SET last_sequence = last_sequence + 1
+    WHERE pair = :pair AND action = :action
+        AND (:sequence IS NULL OR last_sequence + 1 = :sequence)
+    RETURNING last_sequence
+"""
+SQL_START_SEQUENCE = """
+    INSERT INTO sequence_tracker (pair, action, last_sequence)
+    SELECT :pair, :action, 1 WHERE COALESCE(:sequence, 1) = 1
+    ON CONFLICT(pair, action) DO NOTHING
+    RETURNING last_sequence
+"""
+SQL_SELECT_TRADE_BY_HASH = "SELECT * FROM trades WHERE request_hash = ? LIMIT 1"
+SQL_SELECT_TRADE_ID_BY_HASH = "SELECT id FROM trades WHERE request_hash = ? LIMIT 1"
+SQL_SELECT_RECENT_TRADES = """
+    SELECT * FROM trades
+    ORDER BY timestamp DESC
+    LIMIT ?
+"""
+SQL_SELECT_TRADE_SUMMARY = "SELECT total, buy, sell FROM trade_counters WHERE id = 1"
+SQL_INCREMENT_TRADE_COUNTERS = "UPDATE trade_counters SET total = total + ?, buy = buy + ?, sell = sell + ? WHERE id = 1"
+SQL_SELECT_LAST_SEQUENCE = "SELECT last_sequence FROM sequence_tracker WHERE pair = ? AND action = ?"
+SQL_SELECT_BALANCES = "SELECT asset, balance FROM balances"
+SQL_SELECT_BALANCE = "SELECT balance FROM balances WHERE asset = ?"
+SQL_ADJUST_BALANCE = """
+    INSERT INTO balances (asset, balance, updated_at)
+    VALUES (?, ?, ?)
+    ON CONFLICT(asset) DO UPDATE SET
+        balance = balances.balance + excluded.balance,
+        updated_at = excluded.updated_at
+    RETURNING balance
+"""
+# Debits only succeed when funds cover them; no row back means insufficient balance
+SQL_DEBIT_BALANCE = """
+    UPDATE balances SET balance = balance - ?, updated_at = ?
+    WHERE asset = ? AND balance >= ?
+    RETURNING balance
+"""
+SQL_INSERT_BALANCE_IF_MISSING = """
+    INSERT INTO balances (asset, balance, updated_at)
+    VALUES (?, ?, ?)
+    ON CONFLICT(asset) DO NOTHING
+"""
+SQL_CREATE_BALANCE_RETURNING = SQL_INSERT_BALANCE_IF_MISSING.rstrip() + " RETURNING balance"
 
 
-@contextmanager
-def get_connection() -> sqlite3.Connection:
-    """Context manager that yields a SQLite connection with row factory enabled."""
+def _open_connection() -> sqlite3.Connection:
+    """Open a tuned autocommit connection to the database."""
     ensure_initialized()
-    conn = sqlite3.connect(DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+    conn = sqlite3.connect(
+        DB_PATH,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=256,
+    )
     conn.row_factory = sqlite3.Row
+    for pragma in _CONNECTION_PRAGMAS:
+        conn.execute(f"PRAGMA {pragma};")
+    return conn
+
+
+def _conn() -> sqlite3.Connection:
+    """Return the shared write connection, opening it on first use."""
+    global _CONN
+    if _CONN is not None:
+        return _CONN
+
+    with _CONN_LOCK:
+        if _CONN is None:
+            _CONN = _open_connection()
+    return _CONN
+
+
+def _acquire_read_connection() -> sqlite3.Connection:
+    """Take an idle read connection, opening a new one while under the pool limit."""
+    global _READ_POOL_OPENED
     try:
-        yield conn
-        conn.commit()
+        return _READ_POOL.get_nowait()
+    except queue.Empty:
+        pass
+
+    with _CONN_LOCK:
+        if _READ_POOL_OPENED < _READ_POOL_SIZE:
+            _READ_POOL_OPENED += 1
+            open_new = True
+        else:
+            open_new = False
+    if not open_new:
+        return _READ_POOL.get()
+
+    try:
+        return _open_connection()
     except Exception:
-        conn.rollback()
+        with _CONN_LOCK:
+            _READ_POOL_OPENED -= 1
         raise
+
+
+@contextmanager
+def get_connection() -> Iterator[sqlite3.Connection]:
+    """Context manager that borrows a pooled read connection (autocommit mode)."""
+    conn = _acquire_read_connection()
+    try:
+        yield conn
     finally:
-        conn.close()
+        _READ_POOL.put(conn)
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """Run the enclosed statements in a single ``BEGIN IMMEDIATE`` transaction."""
+    conn = _conn()
+    with _WRITE_LOCK:
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK;")
+            raise
+        conn.execute("COMMIT;")
 
 
 def ensure_initialized() -> None:
-    """Initialize database schema if it hasn't been created yet."""
-    global _DB_INITIALIZED
-    if _DB_INITIALIZED:
+    """Initialize database schema if it hasn't been created yet.
+
+    Only the first successful call per process does any work; threads that
+    arrive while it runs block until it has finished.
+    """
+    global _INITIALIZED
+    if _INITIALIZED:
         return
 
-    logger.debug(f"Initializing SQLite database at {DB_PATH}.")
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with _INIT_LOCK:
+        if not _INITIALIZED:
+            _initialize_schema()
+            _INITIALIZED = True
+
+
+_TRADES_DDL = """
+    CREATE TABLE IF NOT EXISTS trades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        transaction_id TEXT NOT NULL UNIQUE,
+        sequence_number INTEGER NOT NULL,
+        request_hash TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,
+        pair TEXT NOT NULL,
+        action TEXT NOT NULL,
+        rsi REAL NOT NULL,
+        price REAL,
+        quantity REAL,
+        status TEXT NOT NULL,
+        metadata TEXT
+    )
+"""
+_BALANCES_DDL = """
+    CREATE TABLE IF NOT EXISTS balances (
+        asset TEXT PRIMARY KEY,
+        balance INTEGER NOT NULL,
+        updated_at INTEGER NOT NULL
+    )
+"""
+
+# Run one statement at a time: executescript() would commit the migration
+# transaction before running.
+_SCHEMA_STATEMENTS: Tuple[str, ...] = (
+    _TRADES_DDL,
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_trades_request_hash ON trades (request_hash)",
+    "CREATE INDEX IF NOT EXISTS idx_trades_pair_action ON trades (pair, action)",
+    "CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades (timestamp DESC)",
+    _BALANCES_DDL,
+    """
+    CREATE TABLE IF NOT EXISTS sequence_tracker (
+        pair TEXT NOT NULL,
+        action TEXT NOT NULL,
+        last_sequence INTEGER NOT NULL,
+        PRIMARY KEY (pair, action)
+    )
+    """,
+    # Running totals maintained by record_trades so /status never scans trades
+    """
+    CREATE TABLE IF NOT EXISTS trade_counters (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total INTEGER NOT NULL,
+        buy INTEGER NOT NULL,
+        sell INTEGER NOT NULL
+    )
+    """,
+    # Seeded from existing history the first time the table is created
+    """
+    INSERT OR IGNORE INTO trade_counters (id, total, buy, sell)
+    SELECT
+        1,
+        COUNT(*),
+        COALESCE(SUM(CASE WHEN action = 'BUY' THEN 1 ELSE 0 END), 0),
+        COALESCE(SUM(CASE WHEN action = 'SELL' THEN 1 ELSE 0 END), 0)
+    FROM trades
+    """,
+)
+
 
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cursor = conn.cursor()
+def _iso_to_ns(column: str) -> str:
+    """SQL expression turning an ISO-8601 UTC text column into epoch nanoseconds.
+
+    Whole seconds come from strftime; the microseconds are cut from the text
+    (isoformat() omits them when zero), since julianday() only keeps milliseconds.
+    """
+    seconds = f"CAST(strftime('%s', {column}) AS INTEGER)"
+    micros = f"CAST(substr({column} || '.000000', instr({column} || '.', '.') + 1, 6) AS INTEGER)"
+    return f"COALESCE({seconds} * 1000000000 + {micros} * 1000, 0)"
 
-    # Enable Write-Ahead Logging for better concurrency (best effort)
-    try:
-        cursor.execute("PRAGMA journal_mode=WAL;")
-    except sqlite3.DatabaseError:
-        logger.warning("Unable to enable WAL mode; continuing with default journal mode.")
 
+def _table_columns(conn: sqlite3.Connection, table: str) -> Dict[str, str]:
+    return {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table});")}
+
+
+def _migrate_schema(conn: sqlite3.Connection) -> None:
+    """Bring tables from older releases up to the current schema."""
     # Check if we're migrating from the old schema; if columns are missing, recreate tables
-    cursor.execute("PRAGMA table_info(trades);")
-    columns = {row[1] for row in cursor.fetchall()}
-    if columns and {"transaction_id", "request_hash", "sequence_number"} - columns:
+    columns = _table_columns(conn, "trades")
+    if columns and {"transaction_id", "request_hash", "sequence_number"} - columns.keys():
         logger.warning("Existing trades table uses legacy schema; recreating schema for security features.")
-        cursor.execute("DROP TABLE IF EXISTS trades;")
-
-    cursor.executescript(
-        """
-        CREATE TABLE IF NOT EXISTS trades (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            transaction_id TEXT NOT NULL UNIQUE,
-            sequence_number INTEGER NOT NULL,
-            request_hash TEXT NOT NULL,
-            timestamp TEXT NOT NULL,
-            pair TEXT NOT NULL,
-            action TEXT NOT NULL,
-            rsi REAL NOT NULL,
-            price REAL,
-            quantity REAL,
-            status TEXT NOT NULL,
-            metadata TEXT
-        );
-
-        CREATE INDEX IF NOT EXISTS idx_trades_request_hash ON trades (request_hash);
-        CREATE INDEX IF NOT EXISTS idx_trades_pair_action ON trades (pair, action);
-
-        CREATE TABLE IF NOT EXISTS balances (
-            asset TEXT PRIMARY KEY,
-            balance REAL NOT NULL,
-            updated_at TEXT NOT NULL
-        );
-
-        CREATE TABLE IF NOT EXISTS sequence_tracker (
-            pair TEXT NOT NULL,
-            action TEXT NOT NULL,
-            last_sequence INTEGER NOT NULL,
-            PRIMARY KEY (pair, action)
-        );
-        """
-    )
+        conn.execute("DROP TABLE IF EXISTS trades;")
+        conn.execute("DROP TABLE IF EXISTS trade_counters;")
+        # Sequences restart along with the now empty history
+        conn.execute("DROP TABLE IF EXISTS sequence_tracker;")
+        columns = {}
+    elif columns and columns.get("timestamp") != "INTEGER":
+        logger.warning("Existing trades table stores text timestamps; converting them to integer nanoseconds.")
+        conn.execute("ALTER TABLE trades RENAME TO trades_text;")
+        conn.execute(_TRADES_DDL)
+        conn.execute(
+            f"""
+            INSERT INTO trades (
+                id, transaction_id, sequence_number, request_hash, timestamp,
+                pair, action, rsi, price, quantity, status, metadata
+            )
+            SELECT
+                id, transaction_id, sequence_number, request_hash, {_iso_to_ns("timestamp")},
+                pair, action, rsi, price, quantity, status, metadata
+            FROM trades_text
+            """
+        )
+        conn.execute("DROP TABLE trades_text;")
+
+    if columns and not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_trades_request_hash'"
+    ).fetchone():
+        # request_hash becomes UNIQUE. Trades recorded twice under one hash by older
+        # releases are all kept: every copy after the first gets ':<id>' appended,
+        # which can never match a current 32-hex-digit key.
+        logger.warning("Existing trades table allows repeated request hashes; adding a unique index.")
+        conn.execute(
+            """
+            UPDATE trades SET request_hash = request_hash || ':' || id
+            WHERE id NOT IN (SELECT MIN(id) FROM trades GROUP BY request_hash)
+            """
+        )
+        conn.execute("DROP INDEX IF EXISTS idx_trades_request_hash;")
+
+    balance_columns = _table_columns(conn, "balances")
+    text_updated_at = balance_columns.get("updated_at", "INTEGER") != "INTEGER"
+    float_balance = balance_columns.get("balance", "INTEGER") != "INTEGER"
+    if text_updated_at or float_balance:
+        if text_updated_at:
+            logger.warning("Existing balances table stores text timestamps; converting them to integer nanoseconds.")
+        if float_balance:
+            logger.warning("Existing balances table stores float amounts; converting them to integer minor units.")
+        balance = f"CAST(ROUND(balance * {_BALANCE_SCALE}) AS INTEGER)" if float_balance else "balance"
+        updated_at = _iso_to_ns("updated_at") if text_updated_at else "updated_at"
+        conn.execute("ALTER TABLE balances RENAME TO balances_old;")
+        conn.execute(_BALANCES_DDL)
+        conn.execute(
+            f"""
+            INSERT INTO balances (asset, balance, updated_at)
+            SELECT asset, {balance}, {updated_at} FROM balances_old
+            """
+        )
+        conn.execute("DROP TABLE balances_old;")
 
-    conn.commit()
-    conn.close()
-    _DB_INITIALIZED = True
 
+def _initialize_schema() -> None:
+    logger.debug("Initializing SQLite database at {}.", DB_PATH)
+    # /tmp always exists on serverless runtimes; skip the stat() there
+    if DB_PATH.parent != Path("/tmp"):
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-def record_trade(
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    try:
+        # Enable Write-Ahead Logging for better concurrency (best effort)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL;")
+        except sqlite3.DatabaseError:
+            logger.warning("Unable to enable WAL mode; continuing with default journal mode.")
+
+        # Inspect and migrate under SQLite's write lock, so a second process
+        # waits and then sees the converted tables instead of converting again
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            _migrate_schema(conn)
+            for statement in _SCHEMA_STATEMENTS:
+                conn.execute(statement)
+        except BaseException:
+            conn.execute("ROLLBACK;")
+            raise
+        conn.execute("COMMIT;")
+    finally:
+        conn.close()
+
+
+def _trade_row(
     *,
     transaction_id: str,
     sequence_number: int,
@@ -117,85 +409,284 @@ def record_trade(
     quantity: Optional[float],
     status: str,
     metadata: Optional[Dict] = None,
-) -> int:
-    """Persist a trade and update sequence tracker."""
-    timestamp = datetime.utcnow().isoformat()
+) -> Tuple:
+    """Build the parameter tuple for ``SQL_INSERT_TRADE``."""
+    timestamp = time.time_ns()
     metadata_json = json.dumps(metadata or {}, ensure_ascii=False)
+    return (
+        transaction_id,
+        sequence_number,
+        request_hash,
+        timestamp,
+        pair,
+        action,
+        rsi,
+        price,
+        quantity,
+        status,
+        metadata_json,
+    )
 
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO trades (
-                transaction_id, sequence_number, request_hash, timestamp,
-                pair, action, rsi, price, quantity, status, metadata
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                transaction_id,
-                sequence_number,
-                request_hash,
-                timestamp,
-                pair,
-                action,
-                rsi,
-                price,
-                quantity,
-                status,
-                metadata_json,
-            ),
-        )
-        trade_id = cursor.lastrowid
 
-        cursor.execute(
-            """
-            INSERT INTO sequence_tracker (pair, action, last_sequence)
-            VALUES (?, ?, ?)
-            ON CONFLICT(pair, action) DO UPDATE SET last_sequence=excluded.last_sequence
-            """,
-            (pair, action, sequence_number),
-        )
+def _claim_sequence(conn: sqlite3.Connection, pair: str, action: str, sequence_number: Optional[int]) -> int:
+    """Take the next sequence number for pair/action, or the requested one if it is next.
 
-    return trade_id
+    Raises ValueError when a requested number is no longer (or not yet) next,
+    e.g. because a concurrent trade claimed it first.
+    """
+    params = {"pair": pair, "action": action, "sequence": sequence_number}
+    row = conn.execute(SQL_ADVANCE_SEQUENCE, params).fetchone()
+    if row is None:
+        row = conn.execute(SQL_START_SEQUENCE, params).fetchone()
+    if row is not None:
+        return row[0]
 
+    last = conn.execute(SQL_SELECT_LAST_SEQUENCE, (pair, action)).fetchone()
+    expected = (last[0] if last else 0) + 1
+    if sequence_number < expected:
+        raise ValueError(f"Sequence number {sequence_number} is stale. Next allowed sequence is {expected}.")
+    raise ValueError(f"Sequence number {sequence_number} skipped expected {expected}.")
 
-def trade_exists(*, transaction_id: Optional[str] = None, request_hash: Optional[str] = None) -> bool:
-    """Check whether a trade already exists by transaction ID or request hash."""
-    if not transaction_id and not request_hash:
-        raise ValueError("Either transaction_id or request_hash must be provided")
 
-    query = "SELECT 1 FROM trades WHERE "
-    params: Tuple = ()
-    clauses = []
-    if transaction_id:
-        clauses.append("transaction_id = ?")
-        params += (transaction_id,)
-    if request_hash:
-        clauses.append("request_hash = ?")
-        params += (request_hash,)
-    query += " OR ".join(clauses) + " LIMIT 1"
+def _insert_trades(conn: sqlite3.Connection, trades: List[Dict[str, Any]]) -> List[Tuple[int, int]]:
+    """Claim sequence numbers and insert trades inside an open transaction.
 
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        result = cursor.fetchone()
-    return result is not None
+    Returns ``(row id, sequence number)`` for each trade.
+    """
+    sequences = []
+    rows = []
+    for trade in trades:
+        sequence = _claim_sequence(conn, trade["pair"], trade["action"], trade.get("sequence_number"))
+        sequences.append(sequence)
+        rows.append(_trade_row(**{**trade, "sequence_number": sequence}))
+
+    conn.executemany(SQL_INSERT_TRADE, rows)
+    # The write lock is held for the whole transaction, so AUTOINCREMENT ids
+    # for this batch are contiguous and end at last_insert_rowid().
+    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+    buys = sum(1 for trade in trades if trade["action"] == "BUY")
+    sells = sum(1 for trade in trades if trade["action"] == "SELL")
+    conn.execute(SQL_INCREMENT_TRADE_COUNTERS, (len(trades), buys, sells))
+    return list(zip(range(last_id - len(trades) + 1, last_id + 1), sequences))
+
+
+def _insert_trade_once(conn: sqlite3.Connection, trade: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """Claim a sequence number and insert one trade unless its request_hash is recorded.
+
+    Returns ``(row id, sequence number)``, or None for a replay. The sequence
+    claim is not undone for a replay; callers roll back to a savepoint.
+    """
+    sequence = _claim_sequence(conn, trade["pair"], trade["action"], trade.get("sequence_number"))
+    row = conn.execute(
+        SQL_INSERT_TRADE_ONCE, _trade_row(**{**trade, "sequence_number": sequence})
+    ).fetchone()
+    if row is None:
+        return None
+
+    action = trade["action"]
+    conn.execute(SQL_INCREMENT_TRADE_COUNTERS, (1, int(action == "BUY"), int(action == "SELL")))
+    return row[0], row[1]
+
+
+def record_trades(trades: List[Dict[str, Any]]) -> List[int]:
+    """Persist several trades in one transaction and return their row ids.
+
+    Each item takes the same keys as the keyword arguments of :func:`record_trade`.
+    """
+    with transaction() as conn:
+        return [trade_id for trade_id, _ in _insert_trades(conn, trades)]
+
+
+def record_trade(
+    *,
+    transaction_id: str,
+    sequence_number: Optional[int],
+    request_hash: str,
+    pair: str,
+    action: str,
+    rsi: float,
+    price: Optional[float],
+    quantity: Optional[float],
+    status: str,
+    metadata: Optional[Dict] = None,
+) -> int:
+    """Persist a trade and update sequence tracker.
+
+    A ``sequence_number`` of None takes the next one for the pair/action.
+    """
+    trade = {
+        "transaction_id": transaction_id,
+        "sequence_number": sequence_number,
+        "request_hash": request_hash,
+        "pair": pair,
+        "action": action,
+        "rsi": rsi,
+        "price": price,
+        "quantity": quantity,
+        "status": status,
+        "metadata": metadata,
+    }
+    return record_trades([trade])[0]
+
+
+@dataclass(frozen=True, slots=True)
+class TradeExecution:
+    """Outcome of applying a trade's balance changes and recording it."""
+
+    trade_id: Optional[int]  # None when nothing was recorded
+    balances: Dict[str, float]
+    available: float = 0.0  # balance of the debited asset when rejected
+    sequence_number: Optional[int] = None  # as claimed for the recorded trade
+    duplicate_of: Optional[int] = None  # id of an earlier trade with the same request_hash
+
+
+BalanceChange = Tuple[str, float]  # (asset, amount)
+
+
+def _select_balances(conn: sqlite3.Connection) -> Dict[str, float]:
+    return {asset: _from_units(units) for asset, units in conn.execute(SQL_SELECT_BALANCES)}
+
+
+def _apply_trade(
+    conn: sqlite3.Connection,
+    trade: Dict[str, Any],
+    debit: BalanceChange,
+    credit: BalanceChange,
+) -> TradeExecution:
+    """Check funds, move balances and insert the trade inside an open transaction.
+
+    Nothing is written when the request was already recorded or the debited
+    asset lacks funds. On success the post-trade balances are stored under
+    ``metadata["balances"]``.
+    """
+    # Dedupe happens at the insert; on a replay everything since here is undone
+    conn.execute("SAVEPOINT apply_trade;")
+    debit_asset, debit_amount = debit
+    timestamp = time.time_ns()
+    if _debit_if_sufficient(conn, debit_asset, _to_units(debit_amount), timestamp) is None:
+        conn.execute("RELEASE apply_trade;")
+        # A replay is reported as such even when funds have since run out
+        existing = conn.execute(SQL_SELECT_TRADE_ID_BY_HASH, (trade["request_hash"],)).fetchone()
+        if existing is not None:
+            return TradeExecution(trade_id=None, balances={}, duplicate_of=existing[0])
+        row = conn.execute(SQL_SELECT_BALANCE, (debit_asset,)).fetchone()
+        available = _from_units(row[0]) if row else 0.0
+        return TradeExecution(trade_id=None, balances=_select_balances(conn), available=available)
+
+    credit_asset, credit_amount = credit
+    conn.execute(SQL_ADJUST_BALANCE, (credit_asset, _to_units(credit_amount), timestamp))
+    balances = _select_balances(conn)
+
+    trade = {**trade, "metadata": {"balances": balances, **(trade.get("metadata") or {})}}
+    inserted = _insert_trade_once(conn, trade)
+    if inserted is None:
+        conn.execute("ROLLBACK TO apply_trade;")
+        conn.execute("RELEASE apply_trade;")
+        existing = conn.execute(SQL_SELECT_TRADE_ID_BY_HASH, (trade["request_hash"],)).fetchone()
+        return TradeExecution(trade_id=None, balances={}, duplicate_of=existing[0])
+
+    conn.execute("RELEASE apply_trade;")
+    trade_id, sequence_number = inserted
+    return TradeExecution(trade_id=trade_id, balances=balances, sequence_number=sequence_number)
+
+
+# Background trade writer. Trades submitted while the writer is busy are
+# committed together in one transaction (one fsync for the whole batch).
+# Started lazily on first use: startup events are unreliable on serverless.
+_WRITE_QUEUE: Optional[asyncio.Queue] = None
+_WRITER_TASK: Optional[asyncio.Task] = None
+
+
+def _write_batch(jobs: List[Dict[str, Any]]) -> List[Union[TradeExecution, Exception]]:
+    """Commit a batch of trade jobs, returning the outcome or the error for each one."""
+    try:
+        with transaction() as conn:
+            return [_apply_trade(conn, **job) for job in jobs]
+    except Exception as exc:
+        if len(jobs) == 1:
+            return [exc]
+        # Retry individually so one bad row doesn't fail the rest of the batch
+        logger.warning("Batched write of {} trades failed; retrying one by one.", len(jobs))
+        return [_write_batch([job])[0] for job in jobs]
+
+
+async def _trade_writer(queue: asyncio.Queue) -> None:
+    """Drain the write queue forever, committing whatever has accumulated."""
+    while True:
+        batch = [await queue.get()]
+        # Yield once so other ready handlers can enqueue before we commit
+        await asyncio.sleep(0)
+        while not queue.empty():
+            batch.append(queue.get_nowait())
+        try:
+            # SQLite I/O runs in a worker thread; futures are resolved back on the loop
+            results = await asyncio.to_thread(_write_batch, [job for job, _ in batch])
+        except Exception as exc:
+            results = [exc] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+def _writer_queue() -> asyncio.Queue:
+    """Return the write queue, (re)starting the writer task for the running loop."""
+    global _WRITE_QUEUE, _WRITER_TASK
+    loop = asyncio.get_running_loop()
+    if _WRITER_TASK is None or _WRITER_TASK.done() or _WRITER_TASK.get_loop() is not loop:
+        _WRITE_QUEUE = asyncio.Queue()
+        _WRITER_TASK = loop.create_task(_trade_writer(_WRITE_QUEUE))
+    return _WRITE_QUEUE
+
+
+async def _submit(job: Dict[str, Any]) -> TradeExecution:
+    future = asyncio.get_running_loop().create_future()
+    _writer_queue().put_nowait((job, future))
+    return await future
+
+
+async def execute_trade_async(
+    *,
+    trade: Dict[str, Any],
+    debit: BalanceChange,
+    credit: BalanceChange,
+) -> TradeExecution:
+    """Apply a trade's balance changes and record it in a single transaction.
+
+    The job is queued for the background writer, which may commit it together
+    with other trades. ``trade`` takes the keyword arguments of :func:`record_trade`.
+    """
+    return await _submit({"trade": trade, "debit": debit, "credit": credit})
 
 
 def fetch_trade_by_request_hash(request_hash: str) -> Optional[Dict]:
     """Retrieve an existing trade by request hash if available."""
     with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM trades WHERE request_hash = ? LIMIT 1", (request_hash,))
-        row = cursor.fetchone()
+        row = conn.execute(SQL_SELECT_TRADE_BY_HASH, (request_hash,)).fetchone()
         if not row:
             return None
         return _row_to_dict(row)
 
 
-def _row_to_dict(row: sqlite3.Row) -> Dict:
+def format_timestamp(timestamp_ns: int) -> str:
+    """Format a stored nanosecond timestamp as a naive UTC ISO-8601 string."""
+    return (_EPOCH + timedelta(microseconds=timestamp_ns // 1000)).isoformat()
+
+
+def _row_to_dict(row: sqlite3.Row, raw_metadata: bool = False) -> Dict:
     data = dict(row)
-    if data.get("metadata"):
+    data["timestamp"] = format_timestamp(data["timestamp"])
+    if raw_metadata:
+        # Cheap shape check so one damaged row can't break a whole JSON body
+        metadata = (data["metadata"] or "").strip()
+        if not (metadata[:1] in ("{", "[") and metadata[-1:] in ("}", "]")):
+            metadata = "{}"
+        data["metadata"] = metadata
+    elif data.get("metadata"):
         try:
             data["metadata"] = json.loads(data["metadata"])
         except json.JSONDecodeError:
@@ -205,34 +696,27 @@ def _row_to_dict(row: sqlite3.Row) -> Dict:
     return data
 
 
+def iter_recent_trades(limit: int = 10, raw_metadata: bool = False) -> Iterator[Dict]:
+    """Yield recent trades one at a time straight off the cursor.
+
+    With ``raw_metadata`` the stored metadata JSON text is passed through
+    undecoded, for callers that splice it into their own serialized output;
+    empty or non-object/array text becomes ``"{}"`` as in the decoded path.
+    """
+    with get_connection() as conn:
+        for row in conn.execute(SQL_SELECT_RECENT_TRADES, (limit,)):
+            yield _row_to_dict(row, raw_metadata)
+
+
 def get_recent_trades(limit: int = 10) -> List[Dict]:
     """Retrieve recent trades."""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT * FROM trades
-            ORDER BY timestamp DESC
-            LIMIT ?
-            """,
-            (limit,),
-        )
-        rows = cursor.fetchall()
-    return [_row_to_dict(row) for row in rows]
+    return list(iter_recent_trades(limit))
 
 
 def get_trade_summary() -> Dict:
     """Get aggregated trade statistics."""
     with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM trades")
-        total = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM trades WHERE action = 'BUY'")
-        buy = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM trades WHERE action = 'SELL'")
-        sell = cursor.fetchone()[0]
+        total, buy, sell = conn.execute(SQL_SELECT_TRADE_SUMMARY).fetchone()
 
     return {
         "total_trades": total,
@@ -244,12 +728,7 @@ def get_trade_summary() -> Dict:
 def get_last_sequence(pair: str, action: str) -> int:
     """Return the last recorded sequence number for the pair/action combo."""
     with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT last_sequence FROM sequence_tracker WHERE pair = ? AND action = ?",
-            (pair, action),
-        )
-        row = cursor.fetchone()
+        row = conn.execute(SQL_SELECT_LAST_SEQUENCE, (pair, action)).fetchone()
     return row[0] if row else 0
 
 
@@ -261,68 +740,57 @@ def get_next_sequence(pair: str, action: str) -> int:
 def get_balances() -> Dict[str, float]:
     """Return all tracked balances as a dictionary."""
     with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT asset, balance FROM balances")
-        rows = cursor.fetchall()
-    return {row[0]: row[1] for row in rows}
+        return _select_balances(conn)
 
 
 def get_balance(asset: str) -> float:
     """Return the balance for a specific asset (defaults to 0)."""
     with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT balance FROM balances WHERE asset = ?", (asset,))
-        row = cursor.fetchone()
-    return row[0] if row else 0.0
+        row = conn.execute(SQL_SELECT_BALANCE, (asset,)).fetchone()
+    return _from_units(row[0]) if row else 0.0
 
 
-def set_balance(asset: str, balance: float) -> None:
-    """Set the exact balance for an asset."""
-    timestamp = datetime.utcnow().isoformat()
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO balances (asset, balance, updated_at)
-            VALUES (?, ?, ?)
-            ON CONFLICT(asset) DO UPDATE SET balance = excluded.balance, updated_at = excluded.updated_at
-            """,
-            (asset, balance, timestamp),
-        )
+def _debit_if_sufficient(
+    conn: sqlite3.Connection, asset: str, units: int, timestamp: int
+) -> Optional[float]:
+    """Subtract units from an asset's balance only if it covers them.
 
-
-def adjust_balance(asset: str, delta: float) -> float:
-    """Adjust an asset balance by delta and return the new balance."""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT balance FROM balances WHERE asset = ?", (asset,))
-        row = cursor.fetchone()
-        current = row[0] if row else 0.0
-        new_balance = current + delta
-        timestamp = datetime.utcnow().isoformat()
-        cursor.execute(
-            """
-            INSERT INTO balances (asset, balance, updated_at)
-            VALUES (?, ?, ?)
-            ON CONFLICT(asset) DO UPDATE SET balance = excluded.balance, updated_at = excluded.updated_at
-            """,
-            (asset, new_balance, timestamp),
-        )
-    return new_balance
+    Returns the new balance, or None (and changes nothing) when funds are
+    insufficient. The check and the write are one statement, so concurrent
+    debits can never overdraw the asset.
+    """
+    row = conn.execute(SQL_DEBIT_BALANCE, (units, timestamp, asset, units)).fetchone()
+    return _from_units(row[0]) if row else None
 
 
 def ensure_initial_balance(asset: str, amount: float) -> None:
     """Ensure a minimum balance exists for an asset."""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT balance FROM balances WHERE asset = ?", (asset,))
-        row = cursor.fetchone()
-        if row is None:
-            timestamp = datetime.utcnow().isoformat()
-            cursor.execute(
-                "INSERT INTO balances (asset, balance, updated_at) VALUES (?, ?, ?)",
-                (asset, amount, timestamp),
-            )
+    timestamp = time.time_ns()
+    with transaction() as conn:
+        conn.execute(SQL_INSERT_BALANCE_IF_MISSING, (asset, _to_units(amount), timestamp))
+
+
+def ensure_and_fetch_balances(defaults: List[BalanceChange]) -> Dict[str, float]:
+    """Create any missing balances from ``(asset, default amount)`` and return all balances.
+
+    Once the assets exist this is a single read; the write transaction is only
+    taken for assets that are not tracked yet, and the created rows come back
+    from the insert instead of a second full read.
+    """
+    balances = get_balances()
+    timestamp = time.time_ns()
+    missing = [(asset, _to_units(amount), timestamp) for asset, amount in defaults if asset not in balances]
+    if not missing:
+        return balances
+
+    with transaction() as conn:
+        for params in missing:
+            row = conn.execute(SQL_CREATE_BALANCE_RETURNING, params).fetchone()
+            if row is None:
+                # Created concurrently since our read; take the stored value
+                row = conn.execute(SQL_SELECT_BALANCE, (params[0],)).fetchone()
+            balances[params[0]] = _from_units(row[0])
+    return balances
 
 
 def get_balance_snapshot() -> Dict[str, float]:
@@ -2,19 +2,29 @@
 FastAPI application for RSI-based trading bot simulation.
 Designed for deployment on Vercel.
 """
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
+import asyncio
+import hashlib
 import sys
+import time
 
-from fastapi import Depends, FastAPI, HTTPException, status
-from fastapi.responses import FileResponse
+import orjson
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Request, Response, status
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from loguru import logger
 
 from auth import verify_api_key
 from config import config
-from db import get_recent_trades
-from notifier import format_trade_notification, send_telegram_notification
+from db import iter_recent_trades
+from notifier import (
+    format_trade_notification,
+    queue_telegram_notification,
+    send_telegram_notification,
+    shutdown_notifier,
+)
 from schemas import StatusResponse, TradeRequest, TradeResponse
 from trader import execute_buy, execute_sell, get_trading_status
 
@@ -22,15 +32,33 @@ from trader import execute_buy, execute_sell, get_trading_status
 logger.remove()
 logger.add(
     sys.stdout,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan> - <level>{message}</level>",
-    level="INFO",
+    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function} - {message}",
+    level=config.LOG_LEVEL,
+    backtrace=False,
+    diagnose=False,
+    colorize=False,
+    serialize=False,
 )
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Release pooled connections on shutdown.
+
+    Nothing is set up here: resources are created lazily on first use because
+    startup hooks are not reliable on serverless platforms.
+    """
+    yield
+    await shutdown_notifier()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="RSI Trading Bot Demo",
     description="Simulated RSI-based trading bot for Bybit futures (testing only)",
     version="1.1.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # Initialize database lazily (not on startup for serverless)
@@ -41,14 +69,9 @@ static_path = Path(__file__).parent / "static"
 if static_path.exists():
     app.mount("/static", StaticFiles(directory=str(static_path)), name="static")
 
-
-@app.get("/")
-async def root():
-    """Serve the web interface."""
-    index_path = static_path / "index.html"
-    if index_path.exists():
-        return FileResponse(str(index_path))
-    return {
+# Static JSON bodies are serialized once; they only change with a deploy
+_API_INFO_JSON = orjson.dumps(
+    {
         "name": "RSI Trading Bot Demo",
         "version": app.version,
         "description": "Simulated RSI-based trading bot for testing",
@@ -61,34 +84,54 @@ async def root():
             "trades": "/trades (GET)",
         },
     }
+)
+_API_INFO_ETAG = f'"{hashlib.sha256(_API_INFO_JSON).hexdigest()[:32]}"'
+_HEALTH_PREFIX = b'{"status":"ok","timestamp":"'
+_HEALTH_SUFFIX = b'","service":"rsi-trading-bot"}'
+# (second, body) swapped as one tuple so concurrent readers never see a mix
+_health_cache = (0, b"")
+
+# The web interface is read once per cold start instead of stat+open per hit
+_index_path = static_path / "index.html"
+_INDEX_HTML = _index_path.read_bytes() if _index_path.exists() else None
+_INDEX_ETAG = f'"{hashlib.sha256(_INDEX_HTML).hexdigest()[:32]}"' if _INDEX_HTML else None
+
+
+def _cached_response(
+    request: Request, body: bytes, etag: str, media_type: str = "application/json"
+) -> Response:
+    """Return a precomputed body, or 304 if the client already has it."""
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=300"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+@app.get("/")
+async def root(request: Request):
+    """Serve the web interface."""
+    if _INDEX_HTML is not None:
+        return _cached_response(request, _INDEX_HTML, _INDEX_ETAG, media_type="text/html")
+    return _cached_response(request, _API_INFO_JSON, _API_INFO_ETAG)
 
 
 @app.get("/api")
-async def api_info():
+async def api_info(request: Request):
     """API information endpoint."""
-    return {
-        "name": "RSI Trading Bot Demo",
-        "version": app.version,
-        "description": "Simulated RSI-based trading bot for testing",
-        "endpoints": {
-            "health": "/health",
-            "status": "/status",
-            "buy": "/buy (POST)",
-            "sell": "/sell (POST)",
-            "notify": "/notify (POST)",
-            "trades": "/trades (GET)",
-        },
-    }
+    return _cached_response(request, _API_INFO_JSON, _API_INFO_ETAG)
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {
-        "status": "ok",
-        "timestamp": datetime.utcnow().isoformat(),
-        "service": "rsi-trading-bot",
-    }
+    global _health_cache
+    now = int(time.time())
+    second, body = _health_cache
+    if second != now:
+        timestamp = datetime.utcfromtimestamp(now).isoformat().encode()
+        body = _HEALTH_PREFIX + timestamp + _HEALTH_SUFFIX
+        _health_cache = (now, body)
+    return Response(content=body, media_type="application/json")
 
 
 @app.get("/status", response_model=StatusResponse)
@@ -102,7 +145,7 @@ async def status_endpoint() -> StatusResponse:
 
 
 @app.post("/buy", response_model=TradeResponse, dependencies=[Depends(verify_api_key)])
-async def buy(trade_request: TradeRequest) -> TradeResponse:
+async def buy(trade_request: TradeRequest, background_tasks: BackgroundTasks) -> TradeResponse:
     """Simulate a BUY trade with security checks."""
     try:
         result = await execute_buy(trade_request)
@@ -113,10 +156,11 @@ async def buy(trade_request: TradeRequest) -> TradeResponse:
                 rsi=result.rsi,
                 price=result.price,
             )
-            send_telegram_notification(message)
+            # Sent after the response so clients don't wait on the Telegram round trip
+            background_tasks.add_task(queue_telegram_notification, message)
         return result
     except ValueError as exc:
-        logger.warning(f"BUY validation error: {exc}")
+        logger.warning("BUY validation error: {}", exc)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
     except Exception as exc:  # pragma: no cover - defensive programming
         logger.exception("Unexpected error executing BUY")
@@ -124,7 +168,7 @@ async def buy(trade_request: TradeRequest) -> TradeResponse:
 
 
 @app.post("/sell", response_model=TradeResponse, dependencies=[Depends(verify_api_key)])
-async def sell(trade_request: TradeRequest) -> TradeResponse:
+async def sell(trade_request: TradeRequest, background_tasks: BackgroundTasks) -> TradeResponse:
     """Simulate a SELL trade with security checks."""
     try:
         result = await execute_sell(trade_request)
@@ -135,10 +179,11 @@ async def sell(trade_request: TradeRequest) -> TradeResponse:
                 rsi=result.rsi,
                 price=result.price,
             )
-            send_telegram_notification(message)
+            # Sent after the response so clients don't wait on the Telegram round trip
+            background_tasks.add_task(queue_telegram_notification, message)
         return result
     except ValueError as exc:
-        logger.warning(f"SELL validation error: {exc}")
+        logger.warning("SELL validation error: {}", exc)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
     except Exception as exc:  # pragma: no cover - defensive programming
         logger.exception("Unexpected error executing SELL")
@@ -152,19 +197,32 @@ async def notify():
         test_message = (
             "🧪 Test notification from RSI Trading Bot Demo\n\nThis is a test message to verify Telegram integration."
         )
-        result = send_telegram_notification(test_message)
+        result = await send_telegram_notification(test_message)
         return result
     except Exception as exc:  # pragma: no cover - defensive programming
         logger.exception("Error sending notification")
         raise HTTPException(status_code=500, detail=f"Failed to send notification: {exc}") from exc
 
 
+def _recent_trades_body(limit: int) -> bytes:
+    """Serialize recent trades as they come off the cursor.
+
+    Metadata was written as JSON by the data layer, so it is embedded as is
+    instead of being decoded and encoded again.
+    """
+    parts = []
+    for trade in iter_recent_trades(limit, raw_metadata=True):
+        trade["metadata"] = orjson.Fragment(trade["metadata"])
+        parts.append(orjson.dumps(trade))
+    return b'{"trades":[' + b",".join(parts) + b'],"count":' + str(len(parts)).encode() + b"}"
+
+
 @app.get("/trades")
 async def get_trades(limit: int = 10):
     """Get recent trade history."""
     try:
-        trades = get_recent_trades(limit=limit)
-        return {"trades": trades, "count": len(trades)}
+        body = await asyncio.to_thread(_recent_trades_body, limit)
+        return Response(content=body, media_type="application/json")
     except Exception as exc:  # pragma: no cover - defensive programming
         logger.exception("Error retrieving trades")
         raise HTTPException(status_code=500, detail=f"Failed to get trades: {exc}") from exc
@@ -1,13 +1,63 @@
 """
 Telegram notification sender for trade alerts.
 """
-import requests
-from typing import Optional
+import asyncio
+import re
+import httpx
+from typing import List, Optional, Tuple
 from loguru import logger
 from config import config
 
+# Shared keep-alive client so repeated notifications reuse the TLS connection.
+# Created lazily on first use and bound to the event loop that created it.
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
 
-def send_telegram_notification(message: str) -> dict:
+# Notifications arriving within _BATCH_WINDOW of each other are joined into a
+# single sendMessage call. 20 trade messages stay well under Telegram's
+# 4096-character limit.
+_MAX_BATCH = 20
+_BATCH_WINDOW = 0.05
+_BATCH_SEPARATOR = "\n---\n"
+_queue: Optional[asyncio.Queue] = None
+_drain_task: Optional[asyncio.Task] = None
+
+# Values from .env.example that mean "not configured"
+_BAD_CREDS = frozenset({None, "", "your_telegram_bot_token_here", "your_telegram_chat_id_here"})
+_PLACEHOLDER_RE = re.compile(r"your_telegram", re.IGNORECASE)
+
+# Trade notification pieces, parsed once instead of per f-string call
+_EMOJI = {"BUY": "🟢", "SELL": "🔴"}
+_TRADE_TEMPLATE = "{emoji} Trade Executed\n\nPair: {pair}\nAction: {action}\nRSI: {rsi:.2f}"
+_PRICE_TEMPLATE = "\nPrice: ${price:,.2f}"
+_TRADE_FOOTER = "\n\nThis is a simulated trade for testing purposes."
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client, creating it for the running loop if needed."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=10,
+            limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def shutdown_notifier() -> None:
+    """Stop the batching task and close the shared HTTP client."""
+    global _client, _drain_task
+    if _drain_task is not None and not _drain_task.done():
+        _drain_task.cancel()
+    _drain_task = None
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+async def send_telegram_notification(message: str) -> dict:
     """
     Send a notification message to Telegram.
     
@@ -21,11 +71,8 @@ def send_telegram_notification(message: str) -> dict:
     token = config.TELEGRAM_TOKEN
     chat_id = config.TELEGRAM_CHAT_ID
     
-    if (not token or not chat_id or 
-        token == "your_telegram_bot_token_here" or 
-        chat_id == "your_telegram_chat_id_here" or
-        "your_telegram" in token.lower() or
-        "your_telegram" in chat_id.lower()):
+    if (token in _BAD_CREDS or chat_id in _BAD_CREDS or
+        _PLACEHOLDER_RE.search(token) or _PLACEHOLDER_RE.search(chat_id)):
         logger.warning("Telegram credentials not configured. Skipping notification.")
         return {
             "status": "skipped",
@@ -49,14 +96,14 @@ def send_telegram_notification(message: str) -> dict:
     }
     
     try:
-        response = requests.post(url, json=payload, timeout=10)
+        response = await _get_client().post(url, json=payload)
         
         # If 400 error, try to get detailed error message
         if response.status_code == 400:
             error_detail = response.json() if response.headers.get('content-type', '').startswith('application/json') else {}
             error_description = error_detail.get('description', 'Bad Request')
-            logger.error(f"Telegram API error 400: {error_description}")
-            logger.debug(f"Full response: {error_detail}")
+            logger.error("Telegram API error 400: {}", error_description)
+            logger.debug("Full response: {}", error_detail)
             
             # Try without HTML parse_mode if it was causing issues
             return {
@@ -67,33 +114,84 @@ def send_telegram_notification(message: str) -> dict:
         
         response.raise_for_status()
         
-        logger.info(f"Telegram notification sent successfully to chat {chat_id}")
+        logger.info("Telegram notification sent successfully to chat {}", chat_id)
         return {
             "status": "sent",
             "message": message
         }
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         # Get detailed error from response
         try:
             error_detail = e.response.json() if e.response else {}
             error_description = error_detail.get('description', str(e))
-            logger.error(f"Telegram API HTTP error: {error_description}")
+            logger.error("Telegram API HTTP error: {}", error_description)
         except:
             error_description = str(e)
-            logger.error(f"Telegram API HTTP error: {e}")
+            logger.error("Telegram API HTTP error: {}", e)
         
         return {
             "status": "error",
             "error": error_description
         }
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to send Telegram notification: {e}")
+    except httpx.HTTPError as e:
+        logger.error("Failed to send Telegram notification: {}", e)
         return {
             "status": "error",
             "error": str(e)
         }
 
 
+async def _drain(queue: asyncio.Queue) -> None:
+    """Collect queued messages into batches and send each batch once."""
+    while True:
+        batch: List[Tuple[str, asyncio.Future]] = [await queue.get()]
+        try:
+            while len(batch) < _MAX_BATCH:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=_BATCH_WINDOW))
+        except asyncio.TimeoutError:
+            pass
+
+        try:
+            result = await send_telegram_notification(_BATCH_SEPARATOR.join(message for message, _ in batch))
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            continue
+
+        for _, future in batch:
+            if not future.done():
+                future.set_result(result)
+
+
+def _notification_queue() -> asyncio.Queue:
+    """Return the batching queue, (re)starting its drain task for the running loop."""
+    global _queue, _drain_task
+    loop = asyncio.get_running_loop()
+    if _drain_task is None or _drain_task.done() or _drain_task.get_loop() is not loop:
+        _queue = asyncio.Queue()
+        _drain_task = loop.create_task(_drain(_queue))
+    return _queue
+
+
+async def queue_telegram_notification(message: str) -> dict:
+    """
+    Queue a message to be sent together with others arriving at the same time.
+    
+    Waits until the batch containing the message has been sent, so callers
+    running as request background tasks finish only after delivery.
+    
+    Args:
+        message: Message text to send
+    
+    Returns:
+        Dictionary with the response status of the batched send
+    """
+    future = asyncio.get_running_loop().create_future()
+    _notification_queue().put_nowait((message, future))
+    return await future
+
+
 def format_trade_notification(pair: str, action: str, rsi: float, price: Optional[float] = None) -> str:
     """
     Format a trade notification message for Telegram.
@@ -107,18 +205,12 @@ def format_trade_notification(pair: str, action: str, rsi: float, price: Optiona
     Returns:
         Formatted message string
     """
-    emoji = "🟢" if action == "BUY" else "🔴"
-    
-    message = f"""{emoji} Trade Executed
-
-Pair: {pair}
-Action: {action}
-RSI: {rsi:.2f}"""
+    message = _TRADE_TEMPLATE.format(
+        emoji=_EMOJI.get(action, "🔴"), pair=pair, action=action, rsi=rsi
+    )
     
     if price:
-        message += f"\nPrice: ${price:,.2f}"
-    
-    message += "\n\nThis is a simulated trade for testing purposes."
+        message += _PRICE_TEMPLATE.format(price=price)
     
-    return message
+    return message + _TRADE_FOOTER
 
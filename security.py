@@ -1,38 +1,112 @@
 """Security utilities for the RSI trading bot."""
 from __future__ import annotations
 
-import base64
 import hashlib
 import hmac
 import os
-import secrets
+import re
+import threading
+import time
 import uuid
-from typing import Dict, Optional
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Optional
 
 from loguru import logger
 
 
+# IDs are cut from one os.urandom read per batch instead of one per ID.
+# Buffers start empty and are cleared in forked children so workers never
+# hand out the same IDs.
+_ID_BATCH = 256
+_REQUEST_IDS: deque = deque()
+_RANDOM_TAILS: deque = deque()
+_ID_LOCK = threading.Lock()
+
+# UUIDv7 state: the 12-bit rand_a field is a per-millisecond counter, so IDs
+# from this process sort in generation order (RFC 9562, method 1).
+_UUID7_LOCK = threading.Lock()
+_uuid7_ms = 0
+_uuid7_seq = 0
+_RAND_B_MASK = (1 << 62) - 1
+
+
+def _clear_id_buffers() -> None:
+    _REQUEST_IDS.clear()
+    _RANDOM_TAILS.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_clear_id_buffers)
+
+
+def _new_request_ids() -> list:
+    raw = os.urandom(16 * _ID_BATCH)
+    return [str(uuid.UUID(bytes=raw[i:i + 16], version=4)) for i in range(0, len(raw), 16)]
+
+
+def _new_random_tails() -> list:
+    raw = os.urandom(8 * _ID_BATCH)
+    return [int.from_bytes(raw[i:i + 8], "big") & _RAND_B_MASK for i in range(0, len(raw), 8)]
+
+
+def _pop_id(buffer: deque, refill) -> Any:
+    while True:
+        try:
+            return buffer.popleft()
+        except IndexError:
+            with _ID_LOCK:
+                if not buffer:
+                    buffer.extend(refill())
+
+
 def generate_request_id() -> str:
-    """Generate a unique request identifier."""
-    return str(uuid.uuid4())
+    """Generate a unique request identifier (random UUID4 string)."""
+    return _pop_id(_REQUEST_IDS, _new_request_ids)
 
 
 def generate_transaction_id() -> str:
-    """Generate a unique transaction identifier."""
-    # Use URL-safe token for readability and logging
-    return secrets.token_urlsafe(20)
+    """Generate a unique, time-ordered transaction identifier (UUIDv7 string)."""
+    global _uuid7_ms, _uuid7_seq
+    tail = _pop_id(_RANDOM_TAILS, _new_random_tails)
+    with _UUID7_LOCK:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _uuid7_ms:
+            _uuid7_ms, _uuid7_seq = now_ms, 0
+        elif _uuid7_seq < 0xFFF:
+            _uuid7_seq += 1
+        else:
+            # Counter exhausted within one millisecond: borrow the next one
+            _uuid7_ms, _uuid7_seq = _uuid7_ms + 1, 0
+        timestamp_ms, seq = _uuid7_ms, _uuid7_seq
+    value = (timestamp_ms << 80) | (0x7 << 76) | (seq << 64) | (0b10 << 62) | tail
+    digits = f"{value:032x}"
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+
+# Dedupe keys only need collision resistance, not a full SHA-256: a 128-bit
+# BLAKE2b digest halves the stored/indexed key (32 hex chars instead of 64).
+_PAYLOAD_DIGEST_SIZE = 16
+_EMPTY_HASH = hashlib.blake2b(b"", digest_size=_PAYLOAD_DIGEST_SIZE).hexdigest()
 
 
 def hash_request_payload(payload: Dict[str, str]) -> str:
     """Create a deterministic hash for a trade request payload.
 
     The payload keys are sorted to ensure consistent hashing. Values are
-    stringified and encoded as UTF-8 before hashing with SHA-256.
+    stringified and encoded as UTF-8 before hashing with 128-bit BLAKE2b.
+    Items are fed to the hash one at a time; the digest is identical to
+    hashing ``"|".join(f"{key}:{value}")`` without building that string.
     """
-    sorted_items = sorted(payload.items())
-    normalized = "|".join(f"{key}:{value}" for key, value in sorted_items)
-    digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
-    return digest
+    if not payload:
+        return _EMPTY_HASH
+    digest = hashlib.blake2b(digest_size=_PAYLOAD_DIGEST_SIZE)
+    separator = b""
+    for key, value in sorted(payload.items()):
+        digest.update(separator)
+        digest.update(f"{key}:{value}".encode("utf-8"))
+        separator = b"|"
+    return digest.hexdigest()
 
 
 def mask_secret(secret: Optional[str]) -> str:
@@ -52,15 +126,15 @@ class KeyManager:
     def __init__(self, pepper_env: str = "KEY_HASH_PEPPER") -> None:
         self._pepper = os.getenv(pepper_env, "")
 
+    def compute_digest(self, value: str) -> bytes:
+        """Return the raw (optionally peppered) SHA-256 digest of a value."""
+        if not self._pepper:
+            return hashlib.sha256(value.encode("utf-8")).digest()
+        return hmac.digest(self._pepper.encode("utf-8"), value.encode("utf-8"), hashlib.sha256)
+
     def _peppered_hash(self, value: str) -> str:
         """Hash a value with an optional pepper for comparison."""
-        if not self._pepper:
-            return hashlib.sha256(value.encode("utf-8")).hexdigest()
-        return hmac.new(
-            key=self._pepper.encode("utf-8"),
-            msg=value.encode("utf-8"),
-            digestmod=hashlib.sha256,
-        ).hexdigest()
+        return self.compute_digest(value).hex()
 
     def verify_hash(self, plaintext: str, hashed: str) -> bool:
         """Verify a plaintext value against a stored hash."""
@@ -74,8 +148,8 @@ class KeyManager:
     def load_and_mask(self, env_key: str) -> str:
         """Load a secret from environment and return its masked form."""
         value = os.getenv(env_key)
-        masked = mask_secret(value)
-        logger.debug(f"Loaded secret {env_key}: {masked}")
+        # Only mask when a sink actually accepts DEBUG records
+        logger.opt(lazy=True).debug("Loaded secret {}: {}", lambda: env_key, lambda: mask_secret(value))
         return value or ""
 
 
@@ -84,19 +158,28 @@ def derive_sequence_key(pair: str, action: str) -> str:
     return f"{pair.upper()}::{action.upper()}"
 
 
-def parse_pair(pair: str) -> Dict[str, str]:
+# Supported quote assets, longest first so USDT/USDC win over USD
+_PAIR_RE = re.compile(r"^(?P<base>.+?)(?P<quote>USDT|USDC|USD|EUR)$")
+
+
+class PairAssets(NamedTuple):
+    """Base and quote assets of a trading pair."""
+
+    base: str
+    quote: str
+
+
+@lru_cache(maxsize=256)
+def parse_pair(pair: str) -> PairAssets:
     """Split a trading pair string into base and quote assets.
 
     Currently supports standard formats like BTCUSDT. If unable to parse,
-    defaults to entire pair as base and USDT as quote.
+    defaults to entire pair as base and USDT as quote. Results are cached;
+    the returned tuple is immutable, so sharing it between callers is safe.
     """
     pair = pair.upper()
-    candidates = ["USDT", "USD", "USDC", "EUR"]
-    for candidate in candidates:
-        if pair.endswith(candidate):
-            base = pair[:-len(candidate)]
-            quote = candidate
-            if base:
-                return {"base": base, "quote": quote}
+    match = _PAIR_RE.match(pair)
+    if match:
+        return PairAssets(match.group("base"), match.group("quote"))
     # Fallback
-    return {"base": pair, "quote": "USDT"}
+    return PairAssets(pair, "USDT")
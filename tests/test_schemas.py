@@ -0,0 +1,36 @@
+"""Pin the response field names.
+
+Responses are built with ``model_construct``, which skips validation, so a
+renamed or dropped field would not fail at runtime.
+"""
+from schemas import StatusResponse, TradeResponse
+
+
+def test_trade_response_fields():
+    assert list(TradeResponse.model_fields) == [
+        "pair",
+        "action",
+        "rsi",
+        "price",
+        "quantity",
+        "status",
+        "trade_id",
+        "transaction_id",
+        "sequence_number",
+        "request_id",
+        "request_hash",
+        "balances",
+        "message",
+    ]
+
+
+def test_status_response_fields():
+    assert list(StatusResponse.model_fields) == [
+        "pair",
+        "rsi",
+        "price",
+        "rsi_oversold",
+        "rsi_overbought",
+        "trades",
+        "balances",
+    ]
@@ -1,83 +1,127 @@
 """Secure trading logic with duplicate prevention and balance management."""
 from __future__ import annotations
 
+import asyncio
 import random
-from typing import Dict, Optional
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 
 from loguru import logger
 
 from config import config
 from db import (
-    adjust_balance,
-    ensure_initial_balance,
+    BalanceChange,
+    ensure_and_fetch_balances,
+    execute_trade_async,
     fetch_trade_by_request_hash,
-    get_balance,
-    get_balance_snapshot,
-    get_balances,
     get_next_sequence,
     get_trade_summary,
-    record_trade,
-    trade_exists,
 )
 from schemas import TradeRequest, TradeResponse, StatusResponse
 from security import (
+    PairAssets,
     generate_transaction_id,
     hash_request_payload,
     parse_pair,
 )
 
 
+# Config is frozen; bind the values read on every trade once at import
+_DEFAULT_PAIR = config.TRADING_PAIR
+_DEFAULT_QTY = config.DEFAULT_ORDER_QUANTITY
+_DEFAULT_BASE_BAL = config.DEFAULT_BASE_BALANCE
+_DEFAULT_QUOTE_BAL = config.DEFAULT_QUOTE_BALANCE
+_RSI_OVERSOLD = config.RSI_OVERSOLD
+_RSI_OVERBOUGHT = config.RSI_OVERBOUGHT
+
+# Bound once; random.uniform is a Python-level wrapper around random()
+_random = random.random
+
+_MOCK_PRICES = {
+    "BTCUSDT": 45000.0,
+    "ETHUSDT": 2500.0,
+    "BNBUSDT": 300.0,
+}
+
+# Assets of the pairs we know about, resolved once at import
+PAIR_INDEX: Dict[str, PairAssets] = {
+    pair: parse_pair(pair) for pair in (*_MOCK_PRICES, _DEFAULT_PAIR.upper())
+}
+
+
+def _pair_assets(pair: str) -> PairAssets:
+    """Return (base, quote) for an upper-cased pair, parsing only unknown pairs."""
+    assets = PAIR_INDEX.get(pair)
+    return assets if assets is not None else parse_pair(pair)
+
+
 def calculate_mock_rsi() -> float:
     """Generate a mock RSI value for demonstration purposes."""
-    return round(random.uniform(10, 90), 2)
+    return round(10 + 80 * _random(), 2)
 
 
 def get_mock_price(pair: Optional[str] = None) -> float:
     """Generate a mock price for the trading pair."""
-    mock_prices = {
-        "BTCUSDT": 45000.0,
-        "ETHUSDT": 2500.0,
-        "BNBUSDT": 300.0,
-    }
-
-    pair = (pair or config.TRADING_PAIR).upper()
-    base_price = mock_prices.get(pair, 100.0)
-    variation = random.uniform(-0.02, 0.02)
+    pair = (pair or _DEFAULT_PAIR).upper()
+    base_price = _MOCK_PRICES.get(pair, 100.0)
+    variation = 0.04 * _random() - 0.02
     return round(base_price * (1 + variation), 2)
 
 
+@lru_cache(maxsize=16)
+def _snapshot(pair: str, bucket: int) -> Tuple[float, float]:
+    return calculate_mock_rsi(), get_mock_price(pair)
+
+
+def _market_snapshot(pair: str) -> Tuple[float, float]:
+    """Return (rsi, price) for the pair, shared by all callers within 100 ms."""
+    return _snapshot(pair, int(time.monotonic() * 10))
+
+
 def _prepare_balances(pair: str) -> Dict[str, float]:
     """Ensure balances exist for the trading pair assets."""
-    assets = parse_pair(pair)
-    ensure_initial_balance(assets["base"], config.DEFAULT_BASE_BALANCE)
-    ensure_initial_balance(assets["quote"], config.DEFAULT_QUOTE_BALANCE)
-    return get_balances()
+    base_asset, quote_asset = _pair_assets(pair)
+    return ensure_and_fetch_balances(
+        [(base_asset, _DEFAULT_BASE_BAL), (quote_asset, _DEFAULT_QUOTE_BAL)]
+    )
 
 
 async def get_trading_status() -> StatusResponse:
     """Return current status with RSI, pricing, and balances."""
-    pair = config.TRADING_PAIR
-    rsi = calculate_mock_rsi()
-    price = get_mock_price(pair)
-    balances = _prepare_balances(pair)
-    summary = get_trade_summary()
+    pair = _DEFAULT_PAIR
+    rsi, price = _market_snapshot(pair)
+    balances, summary = await asyncio.gather(
+        asyncio.to_thread(_prepare_balances, pair),
+        asyncio.to_thread(get_trade_summary),
+    )
 
-    return StatusResponse(
+    # All fields are produced server-side with the right types; skip validation
+    return StatusResponse.model_construct(
         pair=pair,
         rsi=rsi,
         price=price,
-        rsi_oversold=config.RSI_OVERSOLD,
-        rsi_overbought=config.RSI_OVERBOUGHT,
+        rsi_oversold=_RSI_OVERSOLD,
+        rsi_overbought=_RSI_OVERBOUGHT,
         trades=summary,
         balances=balances,
     )
 
 
-def _validate_sequence(pair: str, action: str, sequence_number: Optional[int]) -> int:
-    """Ensure provided sequence number is valid and return final value."""
-    expected_next = get_next_sequence(pair, action)
+def _validate_sequence(pair: str, action: str, sequence_number: Optional[int]) -> Optional[int]:
+    """Ensure provided sequence number is valid and return final value.
+
+    Without a client-provided number nothing is read: the next one is claimed
+    atomically when the trade is recorded. With one, this is only an early
+    check; ``db._claim_sequence`` re-checks it with a guarded UPDATE in the
+    trade transaction, so concurrent callers cannot both take it. Numbers must
+    be exactly next: gaps are never allowed.
+    """
     if sequence_number is None:
-        return expected_next
+        return None
+
+    expected_next = get_next_sequence(pair, action)
 
     if sequence_number < expected_next:
         raise ValueError(
@@ -96,49 +140,29 @@ def _check_rsi_conditions(action: str, rsi: float, force: bool) -> Optional[str]
     if force:
         return None
 
-    if action == "BUY" and rsi >= config.RSI_OVERSOLD:
-        return f"RSI ({rsi}) is not below oversold threshold ({config.RSI_OVERSOLD})."
-    if action == "SELL" and rsi <= config.RSI_OVERBOUGHT:
-        return f"RSI ({rsi}) is not above overbought threshold ({config.RSI_OVERBOUGHT})."
+    if action == "BUY" and rsi >= _RSI_OVERSOLD:
+        return f"RSI ({rsi}) is not below oversold threshold ({_RSI_OVERSOLD})."
+    if action == "SELL" and rsi <= _RSI_OVERBOUGHT:
+        return f"RSI ({rsi}) is not above overbought threshold ({_RSI_OVERBOUGHT})."
     return None
 
 
-def _validate_balances(action: str, pair: str, quantity: float, price: float) -> Optional[str]:
-    assets = parse_pair(pair)
-    base_asset = assets["base"]
-    quote_asset = assets["quote"]
+def _balance_changes(
+    action: str, pair: str, quantity: float, price: float
+) -> Tuple[BalanceChange, BalanceChange]:
+    """Return the (asset, amount) to debit and the (asset, amount) to credit."""
+    base_asset, quote_asset = _pair_assets(pair)
 
     if action == "BUY":
-        cost = price * quantity
-        available_quote = get_balance(quote_asset)
-        if available_quote < cost:
-            return (
-                f"Insufficient {quote_asset} balance. Needed {cost:.2f}, available {available_quote:.2f}."
-            )
-    else:  # SELL
-        available_base = get_balance(base_asset)
-        if available_base < quantity:
-            return (
-                f"Insufficient {base_asset} balance. Needed {quantity:.6f}, available {available_base:.6f}."
-            )
-    return None
-
+        return (quote_asset, price * quantity), (base_asset, quantity)
+    return (base_asset, quantity), (quote_asset, price * quantity)
 
-def _apply_balance_updates(action: str, pair: str, quantity: float, price: float) -> Dict[str, float]:
-    assets = parse_pair(pair)
-    base_asset = assets["base"]
-    quote_asset = assets["quote"]
 
+def _insufficient_balance_message(action: str, debit: BalanceChange, available: float) -> str:
+    asset, needed = debit
     if action == "BUY":
-        cost = price * quantity
-        adjust_balance(quote_asset, -cost)
-        adjust_balance(base_asset, quantity)
-    else:
-        proceeds = price * quantity
-        adjust_balance(base_asset, -quantity)
-        adjust_balance(quote_asset, proceeds)
-
-    return get_balance_snapshot()
+        return f"Insufficient {asset} balance. Needed {needed:.2f}, available {available:.2f}."
+    return f"Insufficient {asset} balance. Needed {needed:.6f}, available {available:.6f}."
 
 
 def _build_trade_response(
@@ -157,7 +181,8 @@ def _build_trade_response(
     balances: Dict[str, float],
     message: Optional[str] = None,
 ) -> TradeResponse:
-    return TradeResponse(
+    # Inputs come from validated requests, config and the database; skip re-validation
+    return TradeResponse.model_construct(
         pair=pair,
         action=action,
         rsi=rsi,
@@ -174,6 +199,26 @@ def _build_trade_response(
     )
 
 
+def _duplicate_trade_response(
+    existing: Dict, request_id: str, request_hash: str, balances: Dict[str, float]
+) -> TradeResponse:
+    return _build_trade_response(
+        pair=existing["pair"],
+        action=existing["action"],
+        rsi=existing["rsi"],
+        price=existing.get("price"),
+        quantity=existing.get("quantity"),
+        status=existing.get("status", "executed"),
+        trade_id=existing.get("id"),
+        transaction_id=existing.get("transaction_id"),
+        sequence_number=existing.get("sequence_number"),
+        request_id=request_id,
+        request_hash=request_hash,
+        balances=existing.get("metadata", {}).get("balances", balances),
+        message="Duplicate request ignored.",
+    )
+
+
 async def execute_buy(request: TradeRequest) -> TradeResponse:
     return await _execute_trade(action="BUY", request=request)
 
@@ -182,15 +227,32 @@ async def execute_sell(request: TradeRequest) -> TradeResponse:
     return await _execute_trade(action="SELL", request=request)
 
 
-async def _execute_trade(action: str, request: TradeRequest) -> TradeResponse:
-    pair = (request.pair or config.TRADING_PAIR).upper()
-    quantity = request.quantity or config.DEFAULT_ORDER_QUANTITY
-    quantity = round(quantity, 6)
+# Trades currently executing, keyed by request_hash. Identical requests that
+# arrive meanwhile wait for that outcome instead of re-running the pipeline.
+_INFLIGHT: Dict[str, "asyncio.Future[TradeResponse]"] = {}
 
-    balances = _prepare_balances(pair)
+# Duplicate responses for recently executed requests, keyed by request_hash, so
+# client retries are answered without touching the database. Per-process and
+# bounded; the database stays the authority once an entry is evicted.
+_RECENT_MAX = 10_000
+_RECENT: "OrderedDict[str, TradeResponse]" = OrderedDict()
 
-    rsi = calculate_mock_rsi()
-    price = get_mock_price(pair)
+
+def _remember_executed(request_hash: str, result: TradeResponse) -> None:
+    if result.status != "executed":
+        return
+    if result.message != "Duplicate request ignored.":
+        result = result.model_copy(update={"message": "Duplicate request ignored."})
+    _RECENT[request_hash] = result
+    _RECENT.move_to_end(request_hash)
+    if len(_RECENT) > _RECENT_MAX:
+        _RECENT.popitem(last=False)
+
+
+async def _execute_trade(action: str, request: TradeRequest) -> TradeResponse:
+    pair = (request.pair or _DEFAULT_PAIR).upper()
+    quantity = request.quantity or _DEFAULT_QTY
+    quantity = round(quantity, 6)
 
     request_hash = hash_request_payload(
         {
@@ -202,27 +264,68 @@ async def _execute_trade(action: str, request: TradeRequest) -> TradeResponse:
         }
     )
 
-    if trade_exists(request_hash=request_hash):
+    recent = _RECENT.get(request_hash)
+    if recent is not None:
+        _RECENT.move_to_end(request_hash)
+        logger.warning("Duplicate trade request detected (recently executed). Returning existing record.")
+        return recent
+
+    inflight = _INFLIGHT.get(request_hash)
+    if inflight is not None:
+        logger.warning("Duplicate trade request is already in flight; waiting for its result.")
+        result = await asyncio.shield(inflight)
+        if result.status == "executed":
+            return result.model_copy(update={"message": "Duplicate request ignored."})
+        return result
+
+    future = asyncio.get_running_loop().create_future()
+    _INFLIGHT[request_hash] = future
+    try:
+        result = await _run_trade(action, request, pair, quantity, request_hash)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as exc:
+        future.set_exception(exc)
+        # Mark retrieved so an unawaited future doesn't log "never retrieved"
+        future.exception()
+        raise
+    else:
+        future.set_result(result)
+        _remember_executed(request_hash, result)
+        return result
+    finally:
+        del _INFLIGHT[request_hash]
+
+
+async def _run_trade(
+    action: str, request: TradeRequest, pair: str, quantity: float, request_hash: str
+) -> TradeResponse:
+    # SQLite calls block; run them on worker threads to keep the loop free.
+    # The reads are independent, so they run concurrently on pooled connections.
+    reads = [
+        asyncio.to_thread(_prepare_balances, pair),
+        # One indexed lookup; a miss is re-checked inside the trade transaction
+        asyncio.to_thread(fetch_trade_by_request_hash, request_hash),
+    ]
+    if request.sequence_number is not None:
+        reads.append(asyncio.to_thread(_validate_sequence, pair, action, request.sequence_number))
+    balances, existing, *checked = await asyncio.gather(*reads, return_exceptions=True)
+    if isinstance(balances, BaseException):
+        raise balances
+    if isinstance(existing, BaseException):
+        raise existing
+
+    rsi, price = _market_snapshot(pair)
+
+    if existing:
         logger.warning("Duplicate trade request detected (request_hash match). Returning existing record.")
-        existing = fetch_trade_by_request_hash(request_hash)
-        if existing:
-            return _build_trade_response(
-                pair=existing["pair"],
-                action=existing["action"],
-                rsi=existing["rsi"],
-                price=existing.get("price"),
-                quantity=existing.get("quantity"),
-                status=existing.get("status", "executed"),
-                trade_id=existing.get("id"),
-                transaction_id=existing.get("transaction_id"),
-                sequence_number=existing.get("sequence_number"),
-                request_id=request.request_id,
-                request_hash=request_hash,
-                balances=existing.get("metadata", {}).get("balances", balances),
-                message="Duplicate request ignored.",
-            )
-
-    sequence_number = _validate_sequence(pair, action, request.sequence_number)
+        return _duplicate_trade_response(existing, request.request_id, request_hash, balances)
+
+    # A replay wins over a stale sequence, so its error is only raised here
+    sequence_number = checked[0] if checked else None
+    if isinstance(sequence_number, BaseException):
+        raise sequence_number
 
     rsi_violation = _check_rsi_conditions(action, rsi, request.force)
     if rsi_violation:
@@ -243,8 +346,36 @@ async def _execute_trade(action: str, request: TradeRequest) -> TradeResponse:
             message=rsi_violation,
         )
 
-    balance_error = _validate_balances(action, pair, quantity, price)
-    if balance_error:
+    # UUIDv7: unique by construction; the UNIQUE column still backstops it
+    transaction_id = generate_transaction_id()
+
+    # Funds check, both balance moves and the insert commit as one transaction
+    debit, credit = _balance_changes(action, pair, quantity, price)
+    execution = await execute_trade_async(
+        trade={
+            "transaction_id": transaction_id,
+            "sequence_number": sequence_number,
+            "request_hash": request_hash,
+            "pair": pair,
+            "action": action,
+            "rsi": rsi,
+            "price": price,
+            "quantity": quantity,
+            "status": "executed",
+            "metadata": {"request_id": request.request_id, "client_ref": request.client_ref},
+        },
+        debit=debit,
+        credit=credit,
+    )
+
+    if execution.duplicate_of is not None:
+        existing = await asyncio.to_thread(fetch_trade_by_request_hash, request_hash)
+        if existing:
+            logger.warning("Concurrent duplicate trade request detected. Returning existing record.")
+            return _duplicate_trade_response(existing, request.request_id, request_hash, balances)
+
+    if execution.trade_id is None:
+        balance_error = _insufficient_balance_message(action, debit, execution.available)
         logger.warning(balance_error)
         return _build_trade_response(
             pair=pair,
@@ -258,39 +389,18 @@ async def _execute_trade(action: str, request: TradeRequest) -> TradeResponse:
             sequence_number=sequence_number,
             request_id=request.request_id,
             request_hash=request_hash,
-            balances=balances,
+            balances=execution.balances,
             message=balance_error,
         )
 
-    transaction_id = generate_transaction_id()
-    if trade_exists(transaction_id=transaction_id):
-        logger.warning("Generated transaction ID already exists; regenerating.")
-        transaction_id = generate_transaction_id()
-
-    updated_balances = _apply_balance_updates(action, pair, quantity, price)
-
-    metadata = {
-        "balances": updated_balances,
-        "request_id": request.request_id,
-        "client_ref": request.client_ref,
-    }
-
-    trade_id = record_trade(
-        transaction_id=transaction_id,
-        sequence_number=sequence_number,
-        request_hash=request_hash,
-        pair=pair,
-        action=action,
-        rsi=rsi,
-        price=price,
-        quantity=quantity,
-        status="executed",
-        metadata=metadata,
-    )
-
     logger.info(
-        f"{action} trade executed: pair={pair} price={price:.2f} quantity={quantity:.6f} "
-        f"transaction_id={transaction_id} sequence={sequence_number}"
+        "{} trade executed: pair={} price={:.2f} quantity={:.6f} transaction_id={} sequence={}",
+        action,
+        pair,
+        price,
+        quantity,
+        transaction_id,
+        execution.sequence_number,
     )
 
     return _build_trade_response(
@@ -300,12 +410,12 @@ async def _execute_trade(action: str, request: TradeRequest) -> TradeResponse:
         price=price,
         quantity=quantity,
         status="executed",
-        trade_id=trade_id,
+        trade_id=execution.trade_id,
         transaction_id=transaction_id,
-        sequence_number=sequence_number,
+        sequence_number=execution.sequence_number,
         request_id=request.request_id,
         request_hash=request_hash,
-        balances=updated_balances,
+        balances=execution.balances,
         message="Trade executed successfully.",
     )
 